@@ -1,26 +1,47 @@
 from __future__ import annotations
 
-import glob
+import functools
 import os
 import re
+import string
+from collections.abc import Callable
 from pathlib import Path
+from types import ModuleType
 
 from gi.repository import Adw, Gdk, Gio, GLib, Gtk
 
+
 # -------------------- optional parsers --------------------
-try:
-    import tomllib  # Py3.11+
-except Exception:
-    tomllib = None  # type: ignore
+# imported on first use so e.g. PyYAML is never loaded for TOML-only setups
+@functools.cache
+def _tomllib() -> ModuleType | None:
+    try:
+        import tomllib  # Py3.11+
+    except Exception:
+        return None
+    return tomllib
 
-try:
-    import yaml  # optional fallback
-except Exception:
-    yaml = None
+@functools.cache
+def _yaml() -> ModuleType | None:
+    try:
+        import yaml  # optional fallback
+    except Exception:
+        return None
+    return yaml
 
 # -------------------- globals / constants --------------------
 _CURRENT_PROVIDER: Gtk.CssProvider | None = None
 _WATCHER_SINGLETON: ThemeWatcher | None = None  # singleton handle
+# (bg, fg, sel_bg, sel_fg, caret, is_dark) currently installed via _CURRENT_PROVIDER
+_LAST_APPLIED: tuple[str | bool | None, ...] | None = None
+
+# parsed palettes keyed by (parser name, realpath, st_mtime_ns, st_size); FIFO-bounded.
+# The parser is part of the key: the same file is read by parsers with different fallbacks.
+# The realpath is: OMARCHY_CURTHEME is a symlink, and sibling themes often share mtime/size.
+_PALETTE_CACHE: dict[tuple[str, str, int, int], dict[str, str | None] | None] = {}
+_PALETTE_CACHE_MAX = 32
+# (raw bytes, raw import paths) per Alacritty config, keyed by (path, mtime, size)
+_IMPORTS_CACHE: dict[tuple[str, int, int], tuple[bytes, list[str]]] = {}
 
 HEX_RE = (
     r"(?:#(?:[0-9a-fA-F]{6}|[0-9a-fA-F]{8})|"
@@ -37,15 +58,106 @@ OMARCHY_MARKERS  = [
 ]
 HYPR_USER_CONF   = Path("~/.config/hypr/hyprland.conf").expanduser()
 
+# -------------------- precompiled patterns --------------------
+_HYPR_SOURCE_RE = re.compile(
+    r"(?mi)^\s*(?:source|include)\s*=\s*(?P<p>.+omarchy/.+?/themes/(?P<name>[^/]+)/hyprland\.conf)\s*$"
+)
+
+_ALACRITTY_BLOCK_KEY: dict[tuple[str, str], re.Pattern[str]] = {
+    (block, key): re.compile(
+        rf"(?mis)^\s*(?:colors\.\s*)?{block}\s*[:=].*?^\s*{key}\s*[:=]\s*(?P<x>{HEX_RE})"
+    )
+    for block, key in (
+        ("primary",   "background"),
+        ("primary",   "foreground"),
+        ("selection", "background"),
+        ("selection", "text"),
+        ("selection", "foreground"),
+        ("cursor",    "cursor"),
+        ("cursor",    "text"),
+    )
+}
+# same patterns over raw bytes, for scanning the Alacritty import chain undecoded
+_ALACRITTY_BLOCK_KEY_B: dict[tuple[str, str], re.Pattern[bytes]] = {
+    bk: re.compile(pat.pattern.encode("ascii")) for bk, pat in _ALACRITTY_BLOCK_KEY.items()
+}
+
+# kitty / foot config key → palette key
+_KITTY_KEYS = {
+    "background": "bg",
+    "foreground": "fg",
+    "cursor": "caret",
+    "selection_background": "sel_bg",
+    "selection_foreground": "sel_fg",
+}
+_FOOT_KEYS = {k.replace("_", "-"): v for k, v in _KITTY_KEYS.items()}
+
 # -------------------- utils --------------------
+def _cache_put(cache: dict, key: tuple, value: object) -> None:
+    # FIFO eviction: dicts keep insertion order, so the first key is the oldest
+    if len(cache) >= _PALETTE_CACHE_MAX:
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+@functools.lru_cache(maxsize=64)
 def _getenv(var: str, default: str | None = None) -> str | None:
-    """Get environment variable with OMNOTE_* preferred, MICROPAD_* fallback."""
+    """
+    Get environment variable with OMNOTE_* preferred, MICROPAD_* fallback.
+
+    Values are cached on first read; call `_getenv.cache_clear()` after
+    changing the environment (e.g. in tests).
+    """
     omnote_var = var.replace("MICROPAD_", "OMNOTE_")
     return os.getenv(omnote_var) or os.getenv(var) or default
 
-def _dbg(msg: str) -> None:
-    if _getenv("MICROPAD_DEBUG"):
-        print(f"[OmNote:theme] {msg}")
+def _dbg_print(fmt: str, *args: object) -> None:
+    print("[OmNote:theme] " + (fmt % args if args else fmt))
+
+def _dbg_off(fmt: str, *args: object) -> None:
+    pass
+
+# decided once at import; callers pass %-style args so disabled calls format nothing
+_DEBUG = bool(_getenv("MICROPAD_DEBUG"))
+_dbg = _dbg_print if _DEBUG else _dbg_off
+
+def _dir_listing(path: Path) -> set[str]:
+    try:
+        with os.scandir(path) as it:
+            return {e.name for e in it}
+    except OSError:
+        return set()
+
+def _existing(paths: list[Path]) -> list[Path]:
+    """
+    Filter `paths` to those present, order preserved.
+
+    Parents shared by several candidates are listed once with os.scandir;
+    lone candidates (e.g. ~/.alacritty.yml in $HOME) are stat'ed instead,
+    so large directories are never listed for a single name.
+    """
+    counts: dict[Path, int] = {}
+    for p in paths:
+        counts[p.parent] = counts.get(p.parent, 0) + 1
+
+    listings: dict[Path, set[str]] = {}
+    out: list[Path] = []
+    for p in paths:
+        parent = p.parent
+        if counts[parent] < 2:
+            if p.exists():
+                out.append(p)
+            continue
+        if parent not in listings:
+            listings[parent] = _dir_listing(parent)
+        if p.name in listings[parent]:
+            out.append(p)
+    return out
+
+def _read_bytes(path: Path) -> bytes:
+    try:
+        return path.read_bytes()
+    except Exception:
+        return b""
 
 def _read(path: Path) -> str:
     try:
@@ -53,165 +165,201 @@ def _read(path: Path) -> str:
     except Exception:
         return ""
 
+def _is_hex(h: str) -> bool:
+    # bytes.fromhex skips embedded whitespace, so also check the decoded length
+    try:
+        return len(bytes.fromhex(h)) * 2 == len(h)
+    except ValueError:
+        return False
+
 def _norm_hex(s: str | None) -> str | None:
     if not s:
         return None
-    s = s.strip()
-    if not s:
+    # fast path: plain #rrggbb
+    if len(s) == 7 and s[0] == "#":
+        return s if _is_hex(s[1:]) else None
+    if s[0].isspace() or s[-1].isspace():
+        s = s.strip()
+        if not s:
+            return None
+    n = len(s)
+    if s[0] == "#":
+        if n in (7, 9) and _is_hex(s[1:]):
+            return s[:7]
         return None
-    if s.startswith("#") and len(s) in (7, 9):
-        return s[:7]
-    if s.startswith("0x") and len(s) == 8:
+    if n == 8 and s[:2] == "0x" and _is_hex(s[2:]):
         return f"#{s[2:]}"
-    if s.startswith("rgb:"):
-        parts = s[4:].split("/")
-        if len(parts) == 3 and all(len(p) == 2 for p in parts):
-            return f"#{parts[0]}{parts[1]}{parts[2]}"
+    if n == 12 and s[:4] == "rgb:" and s[6] == "/" and s[9] == "/":
+        h = s[4:6] + s[7:9] + s[10:12]
+        if _is_hex(h):
+            return f"#{h}"
     return None
 
 def _mix_color(hex_a: str, hex_b: str, t: float) -> str:
-    def _clamp(x: int) -> int: return max(0, min(255, x))
-    def _rgb(h: str) -> tuple[int,int,int]:
-        h = h.strip().lstrip("#")
-        if len(h) == 3:
-            h = "".join(ch*2 for ch in h)
-        return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-    def _hex(r: int,g: int,b: int) -> str: return f"#{r:02x}{g:02x}{b:02x}"
     try:
-        a = _rgb(hex_a)
-        b = _rgb(hex_b)
-    except Exception:
-        a = (30, 30, 30)
-        b = (224, 224, 224)
-    r = _clamp(round(a[0]*(1-t) + b[0]*t))
-    g = _clamp(round(a[1]*(1-t) + b[1]*t))
-    b_ = _clamp(round(a[2]*(1-t) + b[2]*t))
-    return _hex(r,g,b_)
+        ha = hex_a.strip().lstrip("#")[:6]
+        hb = hex_b.strip().lstrip("#")[:6]
+        if len(ha) != 6 or len(hb) != 6 or not (_is_hex(ha) and _is_hex(hb)):
+            raise ValueError
+        va = int(ha, 16)
+        vb = int(hb, 16)
+    except (AttributeError, ValueError):
+        va, vb = 0x1e1e1e, 0xe0e0e0
+    ta = 1.0 - t
+    r = round(((va >> 16) & 0xff) * ta + ((vb >> 16) & 0xff) * t)
+    g = round(((va >> 8) & 0xff) * ta + ((vb >> 8) & 0xff) * t)
+    b = round((va & 0xff) * ta + (vb & 0xff) * t)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def _search_hex(pat: re.Pattern, txt: str | bytes) -> str | None:
+    m = pat.search(txt)
+    if not m:
+        return None
+    x = m.group(1)
+    return _norm_hex(x if isinstance(x, str) else x.decode("ascii"))
 
 # -------------------- palette helpers --------------------
 def _empty_palette() -> dict[str, str | None]:
     return {"bg": None, "fg": None, "sel_bg": None, "sel_fg": None, "caret": None}
 
-def _css_from_palette(pal: dict[str, str | None], *, dark: bool) -> str:
-    bg    = pal.get("bg")     or "#1e1e1e"
-    fg    = pal.get("fg")     or "#e0e0e0"
-    selbg = pal.get("sel_bg") or "alpha(@term_fg,0.15)"
-    selfg = pal.get("sel_fg") or "@term_fg"
-    caret = pal.get("caret")  or "@term_fg"
-
-    entry_mix = 0.06 if dark else 0.12
-
-    css = [
-        "/* generated from palette */",
-        f"@define-color term_bg {bg};",
-        f"@define-color term_fg {fg};",
-        f"@define-color term_sel_bg {selbg};",
-        f"@define-color term_sel_fg {selfg};",
-        f"@define-color term_caret {caret};",
-        "",
-        "window, .background {",
-        "  background-color: @term_bg;",
-        "  color: @term_fg;",
-        "}",
-        "textview, textview.view {",
-        "  background-color: @term_bg;",
-        "  color: @term_fg;",
-        "}",
-        "textview > text, textview.view > text {",
-        "  background-color: @term_bg;",
-        "  background-image: none;",
-        "  color: @term_fg;",
-        "  caret-color: @term_caret;",
-        "}",
-        "textview text selection {",
-        "  background-color: @term_sel_bg;",
-        "  color: @term_sel_fg;",
-        "}",
-        "/* GtkSourceView line numbers gutter */",
-        "textview border, textview.view border {",
-        "  background-color: @term_bg;",
-        "  color: alpha(@term_fg, 0.5);",
-        "}",
-        "textview.view gutter, textview gutter {",
-        "  background-color: @term_bg;",
-        "}",
-        "textview.view gutter.left, textview.view gutter.right {",
-        "  background-color: @term_bg;",
-        "}",
-        "headerbar, .titlebar {",
-        "  background-color: @term_bg;",
-        "  color: @term_fg;",
-        "  border-bottom: 1px solid alpha(@term_fg, 0.08);",
-        "}",
-        "entry, searchentry {",
-        f"  background-color: mix(@term_bg, @term_fg, {entry_mix});",
-        "  color: @term_fg;",
-        "  border: 1px solid alpha(@term_fg, 0.15);",
-        "}",
-        "entry:focus, searchentry:focus {",
-        "  border-color: alpha(@term_fg, 0.28);",
-        "}",
-        "entry selection, searchentry selection {",
-        "  background-color: @term_sel_bg;",
-        "  color: @term_sel_fg;",
-        "}",
-        "/* Floating find/replace bar styling */",
-        "stack {",
-        "  background-color: @term_bg;",
-        "  border: 1px solid alpha(@term_fg, 0.2);",
-        "  border-radius: 8px;",
-        "  box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);",
-        "}",
-        "/* Tab bar theming */",
-        "tabbar, tabbar > scrolledwindow, tabbar > revealer > box {",
-        "  background-color: @term_bg;",
-        "}",
-        "tabbar separator {",
-        "  background: transparent;",
-        "  min-width: 0;",
-        "  min-height: 0;",
-        "}",
-        "tabbar tab, .tab {",
-        "  background-color: alpha(@term_fg, 0.02);",
-        "  color: alpha(@term_fg, 0.5);",
-        "  border: none;",
-        "  border-bottom: 2px solid transparent;",
-        "  min-height: 28px;",
-        "  min-width: 160px;",
-        "  padding: 4px 14px;",
-        "}",
-        "tabbar tab > box, .tab > box {",
-        "  min-width: 0;",
-        "}",
-        "tabbar tab:hover, .tab:hover {",
-        "  background-color: alpha(@term_fg, 0.05);",
-        "  color: alpha(@term_fg, 0.8);",
-        "}",
-        (
-            "tabbar tab:selected, tabbar tab:checked, tabbar tab:active, "
-            ".tab:selected, .tab:checked, .tab:active {"
-        ),
-        "  background-color: alpha(@term_fg, 0.12);",
-        "  color: @term_fg;",
-        "  border-bottom: 2px solid alpha(@term_fg, 0.5);",
-        "  font-weight: 500;",
-        "}",
-        "tabbar .start-action, tabbar .end-action {",
-        "  background-color: @term_bg;",
-        "}",
-        "tabbar button {",
-        "  background: transparent;",
-        "  border: none;",
-        "  color: alpha(@term_fg, 0.5);",
-        "  min-height: 24px;",
-        "  min-width: 24px;",
-        "}",
-        "tabbar button:hover {",
-        "  color: @term_fg;",
-        "  background-color: alpha(@term_fg, 0.15);",
-        "}",
-    ]
-    return "\n".join(css)
+_CSS_TEMPLATE = """\
+/* generated from palette */
+@define-color term_bg {bg};
+@define-color term_fg {fg};
+@define-color term_sel_bg {selbg};
+@define-color term_sel_fg {selfg};
+@define-color term_caret {caret};
+
+window, .background {{
+  background-color: @term_bg;
+  color: @term_fg;
+}}
+textview, textview.view {{
+  background-color: @term_bg;
+  color: @term_fg;
+}}
+textview > text, textview.view > text {{
+  background-color: @term_bg;
+  background-image: none;
+  color: @term_fg;
+  caret-color: @term_caret;
+}}
+textview text selection {{
+  background-color: @term_sel_bg;
+  color: @term_sel_fg;
+}}
+/* GtkSourceView line numbers gutter */
+textview border, textview.view border {{
+  background-color: @term_bg;
+  color: alpha(@term_fg, 0.5);
+}}
+textview.view gutter, textview gutter {{
+  background-color: @term_bg;
+}}
+textview.view gutter.left, textview.view gutter.right {{
+  background-color: @term_bg;
+}}
+headerbar, .titlebar {{
+  background-color: @term_bg;
+  color: @term_fg;
+  border-bottom: 1px solid alpha(@term_fg, 0.08);
+}}
+entry, searchentry {{
+  background-color: mix(@term_bg, @term_fg, {entry_mix});
+  color: @term_fg;
+  border: 1px solid alpha(@term_fg, 0.15);
+}}
+entry:focus, searchentry:focus {{
+  border-color: alpha(@term_fg, 0.28);
+}}
+entry selection, searchentry selection {{
+  background-color: @term_sel_bg;
+  color: @term_sel_fg;
+}}
+/* Floating find/replace bar styling */
+stack {{
+  background-color: @term_bg;
+  border: 1px solid alpha(@term_fg, 0.2);
+  border-radius: 8px;
+  box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);
+}}
+/* Tab bar theming */
+tabbar, tabbar > scrolledwindow, tabbar > revealer > box {{
+  background-color: @term_bg;
+}}
+tabbar separator {{
+  background: transparent;
+  min-width: 0;
+  min-height: 0;
+}}
+tabbar tab, .tab {{
+  background-color: alpha(@term_fg, 0.02);
+  color: alpha(@term_fg, 0.5);
+  border: none;
+  border-bottom: 2px solid transparent;
+  min-height: 28px;
+  min-width: 160px;
+  padding: 4px 14px;
+}}
+tabbar tab > box, .tab > box {{
+  min-width: 0;
+}}
+tabbar tab:hover, .tab:hover {{
+  background-color: alpha(@term_fg, 0.05);
+  color: alpha(@term_fg, 0.8);
+}}
+tabbar tab:selected, tabbar tab:checked, tabbar tab:active,
+.tab:selected, .tab:checked, .tab:active {{
+  background-color: alpha(@term_fg, 0.12);
+  color: @term_fg;
+  border-bottom: 2px solid alpha(@term_fg, 0.5);
+  font-weight: 500;
+}}
+tabbar .start-action, tabbar .end-action {{
+  background-color: @term_bg;
+}}
+tabbar button {{
+  background: transparent;
+  border: none;
+  color: alpha(@term_fg, 0.5);
+  min-height: 24px;
+  min-width: 24px;
+}}
+tabbar button:hover {{
+  color: @term_fg;
+  background-color: alpha(@term_fg, 0.15);
+}}"""
+
+# template pre-split into encoded literal chunks and placeholder field names
+_CSS_PARTS: tuple[bytes | str, ...] = tuple(
+    part
+    for literal, field, _spec, _conv in string.Formatter().parse(_CSS_TEMPLATE)
+    for part in (literal.encode("utf-8"), field)
+    if part
+)
+
+# last (palette, dark) → CSS bytes, so repeated identical calls reuse the object
+_CSS_MEMO: tuple[tuple[object, ...], bytes] | None = None
+
+def _css_from_palette(pal: dict[str, str | None], *, dark: bool) -> bytes:
+    global _CSS_MEMO
+    key = (
+        pal.get("bg"), pal.get("fg"), pal.get("sel_bg"), pal.get("sel_fg"), pal.get("caret"), dark,
+    )
+    if _CSS_MEMO is not None and _CSS_MEMO[0] == key:
+        return _CSS_MEMO[1]
+
+    values = {
+        "bg":        (pal.get("bg")     or "#1e1e1e").encode("utf-8"),
+        "fg":        (pal.get("fg")     or "#e0e0e0").encode("utf-8"),
+        "selbg":     (pal.get("sel_bg") or "alpha(@term_fg,0.15)").encode("utf-8"),
+        "selfg":     (pal.get("sel_fg") or "@term_fg").encode("utf-8"),
+        "caret":     (pal.get("caret")  or "@term_fg").encode("utf-8"),
+        "entry_mix": b"0.06" if dark else b"0.12",
+    }
+    css = b"".join(p if isinstance(p, bytes) else values[p] for p in _CSS_PARTS)
+    _CSS_MEMO = (key, css)
+    return css
 
 # -------------------- detect active Omarchy theme dir --------------------
 def _omarchy_current_dir() -> Path | None:
@@ -237,10 +385,7 @@ def _omarchy_current_dir() -> Path | None:
 
     if HYPR_USER_CONF.exists():
         txt = _read(HYPR_USER_CONF)
-        m = re.search(
-            r"(?mi)^\s*(?:source|include)\s*=\s*(?P<p>.+omarchy/.+?/themes/(?P<name>[^/]+)/hyprland\.conf)\s*$",
-            txt,
-        )
+        m = _HYPR_SOURCE_RE.search(txt)
         if m:
             name = m.group("name")
             p = (OMARCHY_THEMES / name).expanduser()
@@ -257,6 +402,7 @@ ALACRITTY_MAIN_CANDIDATES = [
     lambda: str(Path("~/.alacritty.yml").expanduser()),
 ]
 
+IMPORT_HINT_RE = re.compile(rb"(?i)import")
 IMPORT_LINE_RE = re.compile(r'(?mi)^\s*(imports?|import)\s*:\s*(?P<val>.+)$')
 QUOTED_PATH_RE = re.compile(r'"([^"]+)"|\'([^\']+)\'')
 DASHED_ITEM_RE = re.compile(r'(?mi)^\s*-\s*(?:"([^"]+)"|\'([^\']+)\')\s*$')
@@ -264,20 +410,29 @@ DASHED_ITEM_RE = re.compile(r'(?mi)^\s*-\s*(?:"([^"]+)"|\'([^\']+)\')\s*$')
 def _parse_alacritty(path: Path) -> dict[str, str | None] | None:
     if not path.exists():
         return None
-    text = _read(path)
+    return _parse_alacritty_text(_read(path), path.suffix.lower(), origin=path)
+
+def _parse_alacritty_text(
+    text: str, suffix: str, *, origin: Path | str = "<text>"
+) -> dict[str, str | None] | None:
+    """Structured TOML/YAML parse of Alacritty config `text`; None if unparseable."""
     data = None
 
-    if path.suffix.lower() == ".toml" and tomllib is not None:
-        try:
-            data = tomllib.loads(text)
-        except Exception as e:
-            _dbg(f"TOML parse failed for {path}: {e}")
+    if suffix == ".toml":
+        tomllib = _tomllib()
+        if tomllib is not None:
+            try:
+                data = tomllib.loads(text)
+            except Exception as e:
+                _dbg("TOML parse failed for %s: %s", origin, e)
 
-    if data is None and yaml is not None and path.suffix.lower() in {".yml", ".yaml"}:
-        try:
-            data = yaml.safe_load(text)
-        except Exception as e:
-            _dbg(f"YAML parse failed for {path}: {e}")
+    if data is None and suffix in {".yml", ".yaml"}:
+        yaml = _yaml()
+        if yaml is not None:
+            try:
+                data = yaml.safe_load(text)
+            except Exception as e:
+                _dbg("YAML parse failed for %s: %s", origin, e)
 
     if not isinstance(data, dict):
         return None
@@ -309,34 +464,29 @@ def _parse_alacritty(path: Path) -> dict[str, str | None] | None:
         "caret": _norm_hex(caret) or caret,
     }
 
-def _collect_imports_text(
-    main_path: Path, visited: set[Path], depth: int = 0, max_depth: int = 8
-) -> str:
-    if depth > max_depth:
-        return ""
+def _import_specs(path: Path) -> tuple[bytes, list[str]]:
+    """Return (raw bytes, raw import paths) for an Alacritty config, cached by stat."""
     try:
-        main_path = main_path.resolve()
-    except Exception:
-        pass
-    if main_path in visited or not main_path.exists():
-        return ""
-    visited.add(main_path)
-
-    base_dir = main_path.parent
-    txt = _read(main_path)
-    if not txt:
-        return ""
-
-    combined: list[str] = []
-
+        st = path.stat()
+    except OSError:
+        return b"", []
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    hit = _IMPORTS_CACHE.get(key)
+    if hit is not None:
+        return hit
+
+    data = _read_bytes(path)
+    paths: list[str] = []
+    # only files that mention imports are decoded; paths are needed as str anyway
+    txt = data.decode("utf-8", errors="ignore") if IMPORT_HINT_RE.search(data) else ""
     for m in IMPORT_LINE_RE.finditer(txt):
         val = m.group("val").strip()
-        paths: list[str] = []
+        found: list[str] = []
         for qm in QUOTED_PATH_RE.finditer(val):
             p = qm.group(1) or qm.group(2)
             if p:
-                paths.append(p)
-        if not paths and (val == "" or val.endswith(":") or val in ("|", ">")):
+                found.append(p)
+        if not found and (val == "" or val.endswith(":") or val in ("|", ">")):
             after = txt[m.end():]
             for line in after.splitlines():
                 if line.strip().startswith(
@@ -347,73 +497,135 @@ def _collect_imports_text(
                 if dm:
                     p = dm.group(1) or dm.group(2)
                     if p:
-                        paths.append(p)
+                        found.append(p)
                 elif line.strip() and not line.strip().startswith("-"):
                     break
+        paths += found
+
+    _cache_put(_IMPORTS_CACHE, key, (data, paths))
+    return data, paths
 
-        for raw in paths:
-            for path_str in glob.glob(raw):
-                p = Path(path_str).expanduser()
-                if not p.is_absolute():
-                    p = (base_dir / p).resolve()
-                combined.append(_collect_imports_text(p, visited, depth + 1, max_depth))
+def _expand_import(raw: str, base_dir: Path) -> list[Path]:
+    p = Path(raw).expanduser()
+    if not any(c in raw for c in "*?["):
+        return [p if p.is_absolute() else base_dir / p]
+    # Path.glob rejects some patterns glob.glob accepted (e.g. "**x.yml"): treat as no match
+    try:
+        if p.is_absolute():
+            return sorted(Path(p.anchor).glob(str(p.relative_to(p.anchor))))
+        return sorted(base_dir.glob(str(p)))
+    except ValueError:
+        return []
 
-    combined.append(txt)
-    return "\n".join(filter(None, combined))
+def _collect_imports_text(
+    main_path: Path, visited: set[str], depth: int = 0, max_depth: int = 8
+) -> bytes:
+    """Concatenate `main_path` and its imports (imports first) as raw bytes."""
+    if depth > max_depth:
+        return b""
+    rp = os.path.realpath(main_path)
+    if rp in visited:
+        return b""
+    visited.add(rp)
 
-def _palette_from_alacritty_text(txt: str) -> dict[str, str | None]:
+    main_path = Path(rp)
+    base_dir = main_path.parent
+    # a missing file stats as empty here, so no separate exists() check
+    data, imports = _import_specs(main_path)
+    if not data:
+        return b""
+
+    combined: list[bytes] = []
+    for raw in imports:
+        for p in _expand_import(raw, base_dir):
+            combined.append(_collect_imports_text(p, visited, depth + 1, max_depth))
+
+    combined.append(data)
+    return b"\n".join(filter(None, combined))
+
+def _palette_from_alacritty_text(txt: str | bytes) -> dict[str, str | None]:
+    bk = _ALACRITTY_BLOCK_KEY_B if isinstance(txt, bytes) else _ALACRITTY_BLOCK_KEY
     out = _empty_palette()
-    def block_key(block: str, key: str) -> str | None:
-        pat = rf"(?mis)^\s*(?:colors\.\s*)?{block}\s*[:=].*?^\s*{key}\s*[:=]\s*(?P<x>{HEX_RE})"
-        m = re.search(pat, txt)
-        return _norm_hex(m.group("x")) if m else None
-    out["bg"]     = block_key("primary",   "background")
-    out["fg"]     = block_key("primary",   "foreground")
-    out["sel_bg"] = block_key("selection", "background")
-    out["sel_fg"] = block_key("selection", "text") or block_key("selection", "foreground")
-    out["caret"]  = block_key("cursor",    "cursor") or block_key("cursor", "text")
+    out["bg"]     = _search_hex(bk["primary", "background"], txt)
+    out["fg"]     = _search_hex(bk["primary", "foreground"], txt)
+    out["sel_bg"] = _search_hex(bk["selection", "background"], txt)
+    out["sel_fg"] = (
+        _search_hex(bk["selection", "text"], txt)
+        or _search_hex(bk["selection", "foreground"], txt)
+    )
+    out["caret"]  = (
+        _search_hex(bk["cursor", "cursor"], txt) or _search_hex(bk["cursor", "text"], txt)
+    )
     return out
 
 # -------------------- kitty / foot parsers --------------------
 def _palette_from_kitty_text(txt: str) -> dict[str, str | None]:
+    # `key value` lines; first occurrence of each key wins
     out = _empty_palette()
-    def grab(k: str) -> str | None:
-        m = re.search(rf"(?mi)^\s*{k}\s+({HEX_RE})", txt)
-        return _norm_hex(m.group(1)) if m else None
-    out["bg"]    = grab("background")
-    out["fg"]    = grab("foreground")
-    out["caret"] = grab("cursor")
-    out["sel_bg"]= grab("selection_background")
-    out["sel_fg"]= grab("selection_foreground")
+    for line in txt.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) != 2:
+            continue
+        k = _KITTY_KEYS.get(parts[0].lower())
+        if k and out[k] is None:
+            out[k] = _norm_hex(parts[1].split(None, 1)[0])
     return out
 
 def _palette_from_foot_text(txt: str) -> dict[str, str | None]:
+    # `key=value` lines; first occurrence of each key wins
     out = _empty_palette()
-    def grab(k: str) -> str | None:
-        m = re.search(rf"(?mi)^\s*{k}\s*=\s*({HEX_RE})", txt)
-        return _norm_hex(m.group(1)) if m else None
-    out["bg"]    = grab("background")
-    out["fg"]    = grab("foreground")
-    out["caret"] = grab("cursor")
-    out["sel_bg"]= grab("selection-background")
-    out["sel_fg"]= grab("selection-foreground")
+    for line in txt.splitlines():
+        key, sep, val = line.partition("=")
+        if not sep:
+            continue
+        k = _FOOT_KEYS.get(key.strip().lower())
+        vals = val.split(None, 1)
+        if k and vals and out[k] is None:
+            out[k] = _norm_hex(vals[0])
     return out
 
+# -------------------- parse cache --------------------
+def _cached_parse(
+    path: Path, parser: Callable[[Path], dict[str, str | None] | None]
+) -> dict[str, str | None] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return parser(path)
+    key = (parser.__name__, os.path.realpath(path), st.st_mtime_ns, st.st_size)
+    if key in _PALETTE_CACHE:
+        pal = _PALETTE_CACHE[key]
+        return dict(pal) if pal is not None else None
+    pal = parser(path)
+    _cache_put(_PALETTE_CACHE, key, dict(pal) if pal is not None else None)
+    return pal
+
+def _parse_alacritty_file(path: Path) -> dict[str, str | None]:
+    # read once: structured parse first, regex scan of the same text as fallback
+    text = _read(path)
+    pal = _parse_alacritty_text(text, path.suffix.lower(), origin=path)
+    if pal:
+        return pal
+    return _palette_from_alacritty_text(text)
+
+def _parse_kitty_file(path: Path) -> dict[str, str | None]:
+    return _palette_from_kitty_text(_read(path))
+
+def _parse_foot_file(path: Path) -> dict[str, str | None]:
+    return _palette_from_foot_text(_read(path))
+
 # -------------------- palette sources --------------------
 def _palette_from_theme_dir(theme_dir: Path) -> dict[str, str | None]:
     for fname in ("alacritty.toml", "alacritty.yaml", "alacritty.yml"):
         f = theme_dir / fname
         if f.exists():
-            pal = _parse_alacritty(f)
-            if pal:
-                return pal
-            return _palette_from_alacritty_text(_read(f))
+            return _cached_parse(f, _parse_alacritty_file) or _empty_palette()
     f = theme_dir / "kitty.conf"
     if f.exists():
-        return _palette_from_kitty_text(_read(f))
+        return _cached_parse(f, _parse_kitty_file) or _empty_palette()
     f = theme_dir / "foot.ini"
     if f.exists():
-        return _palette_from_foot_text(_read(f))
+        return _cached_parse(f, _parse_foot_file) or _empty_palette()
     return _empty_palette()
 
 def _from_env() -> dict[str, str | None]:
@@ -435,12 +647,12 @@ def _from_omarchy_theme() -> dict[str, str | None]:
         return _empty_palette()
     pal = _palette_from_theme_dir(td)
     if any(pal.values()):
-        _dbg(f"Omarchy palette applied from {td}")
+        _dbg("Omarchy palette applied from %s", td)
         return pal
     _dbg("Omarchy theme had no terminal palette files.")
     return _empty_palette()
 
-def _from_alacritty_config() -> dict[str, str | None]:
+def _alacritty_candidates() -> list[Path]:
     cands: list[Path] = []
     envp = os.getenv("ALACRITTY_CONFIG")
     if envp:
@@ -457,20 +669,22 @@ def _from_alacritty_config() -> dict[str, str | None]:
         Path("~/.config/alacritty/alacritty.yaml").expanduser(),
         Path("~/.alacritty.yml").expanduser(),
     ]
+    return cands
 
-    for p in cands:
-        if p.exists():
-            if p.suffix.lower() in {".toml", ".yaml", ".yml"}:
-                pal = _parse_alacritty(p)
-                if pal and any(pal.values()):
-                    _dbg(f"Alacritty palette from {p}")
-                    return pal
-            agg = _collect_imports_text(p, visited=set())
-            if agg:
-                pal = _palette_from_alacritty_text(agg)
-                if any(pal.values()):
-                    _dbg(f"Alacritty palette (imports) via {p}")
-                    return pal
+def _from_alacritty_config() -> dict[str, str | None]:
+    for p in _existing(_alacritty_candidates()):
+        if p.suffix.lower() in {".toml", ".yaml", ".yml"}:
+            # a structured parse fills every key, so the import walk is only a fallback
+            pal = _cached_parse(p, _parse_alacritty)
+            if pal and any(pal.values()):
+                _dbg("Alacritty palette from %s", p)
+                return pal
+        agg = _collect_imports_text(p, visited=set())
+        if agg:
+            pal = _palette_from_alacritty_text(agg)
+            if any(pal.values()):
+                _dbg("Alacritty palette (imports) via %s", p)
+                return pal
 
     _dbg("Alacritty palette not found.")
     return _empty_palette()
@@ -478,16 +692,8 @@ def _from_alacritty_config() -> dict[str, str | None]:
 def _from_gtk_defaults() -> dict[str, str | None]:
     return _empty_palette()
 
-def _merge_pref(*dicts: dict[str, str | None]) -> dict[str, str | None]:
-    out = _empty_palette()
-    for d in dicts:
-        for k, v in d.items():
-            if out[k] is None and v:
-                out[k] = v
-    return out
-
 # -------------------- CSS application (GTK4-safe) --------------------
-def _apply_css(css: str | None = None, path: Path | None = None) -> None:
+def _apply_css(css: bytes | None = None, path: Path | None = None) -> None:
     global _CURRENT_PROVIDER
 
     disp = Gdk.Display.get_default()
@@ -506,7 +712,7 @@ def _apply_css(css: str | None = None, path: Path | None = None) -> None:
 
     provider = Gtk.CssProvider()
     if css is not None:
-        provider.load_from_data(css.encode("utf-8"))
+        provider.load_from_data(css)
     elif path is not None:
         provider.load_from_path(str(path))
 
@@ -527,27 +733,43 @@ def apply_best_theme() -> None:
       5) Fallback: ~/.config/gtk-4.0/gtk.css
       6) Else: clear provider (inherit system)
     """
+    global _LAST_APPLIED
+
     if _getenv("MICROPAD_THEME_MODE", "").lower() == "system":
         _dbg("Theme mode=system → clearing provider (inherit system).")
+        _LAST_APPLIED = None
         _apply_css(None, None)
         return
 
-    merged = _merge_pref(
-        _from_omarchy_theme(),
-        _from_alacritty_config(),
-        _from_env(),
-        _from_gtk_defaults(),
-    )
+    omarchy = _from_omarchy_theme()
+    alac = _from_alacritty_config()
+    env = _from_env()
+    gtkd = _from_gtk_defaults()
+    # first non-empty value per key, in priority order
+    merged = {
+        k: omarchy.get(k) or alac.get(k) or env.get(k) or gtkd.get(k)
+        for k in ("bg", "fg", "sel_bg", "sel_fg", "caret")
+    }
 
     sm = Adw.StyleManager.get_default()
     is_dark = bool(getattr(sm, "get_dark", lambda: False)())
 
-    css_text: str | None = (
+    key = (
+        merged["bg"], merged["fg"], merged["sel_bg"], merged["sel_fg"], merged["caret"], is_dark,
+    )
+    if key == _LAST_APPLIED and _CURRENT_PROVIDER is not None:
+        _dbg("theme unchanged")
+        return
+    _LAST_APPLIED = None
+
+    css: bytes | None = (
         _css_from_palette(merged, dark=is_dark) if isinstance(merged, dict) else None
     )
-    if css_text:
+    if css:
         _dbg("Using palette → CSS.")
-        _apply_css(css=css_text)
+        _apply_css(css=css)
+        if _CURRENT_PROVIDER is not None:
+            _LAST_APPLIED = key
         return
 
     user_gtk_css = Path.home() / ".config" / "gtk-4.0" / "gtk.css"
@@ -560,16 +782,48 @@ def apply_best_theme() -> None:
     _apply_css(None, None)
 
 # -------------------- watcher --------------------
+# ALACRITTY_CONFIG is read per call in ThemeWatcher._watch_paths
+_WATCH_CANDIDATES: tuple[Path, ...] = (
+    OMARCHY_DIR,
+    OMARCHY_THEMES,
+    # Watch parent dir to detect symlink changes
+    OMARCHY_DIR / "current",
+    OMARCHY_CURTHEME / "alacritty.toml",
+    OMARCHY_CURTHEME / "kitty.conf",
+    OMARCHY_CURTHEME / "foot.ini",
+    HYPR_USER_CONF,
+    *(
+        Path(p).expanduser()
+        for p in (
+            "~/.config/alacritty",
+            "~/.config/alacritty/alacritty.yml",
+            "~/.config/alacritty/alacritty.yaml",
+            "~/.config/alacritty/alacritty.toml",
+            "~/.alacritty.yml",
+            "~/.config/gtk-4.0/gtk.css",
+        )
+    ),
+)
+
 class ThemeWatcher:
     """
     FileMonitor-based watcher with clean lifecycle:
     - disconnects Adw.StyleManager signal
     - cancels Gio.FileMonitor instances
-    - removes GLib timeout sources
+    - removes the pending GLib timeout source
+    - ignores in-progress write events
     """
+    # CHANGED / ATTRIBUTE_CHANGED fire mid-write; wait for the settled events
+    _RELEVANT_EVENTS = frozenset((
+        Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+        Gio.FileMonitorEvent.CREATED,
+        Gio.FileMonitorEvent.DELETED,
+        Gio.FileMonitorEvent.MOVED_IN,
+    ))
+
     def __init__(self) -> None:
         self._monitors: list[Gio.FileMonitor] = []
-        self._timeouts: set[int] = set()
+        self._pending_sid: int | None = None
         self._sm = Adw.StyleManager.get_default()
         self._sm_handler: int | None = self._sm.connect(
             "notify::color-scheme", self._on_style_change
@@ -597,40 +851,23 @@ class ThemeWatcher:
                 pass
         self._monitors.clear()
 
-        # remove pending timeouts
-        for sid in list(self._timeouts):
+        # remove pending timeout
+        if self._pending_sid is not None:
             try:
-                GLib.source_remove(sid)
+                GLib.source_remove(self._pending_sid)
             except Exception:
                 pass
-        self._timeouts.clear()
+            self._pending_sid = None
 
         _dbg("ThemeWatcher stopped.")
 
     # ---- internals ----
     def _watch_paths(self) -> list[Path]:
-        cands = [
-            OMARCHY_DIR,
-            OMARCHY_THEMES,
-            # Watch parent dir to detect symlink changes
-            Path("~/.config/omarchy/current").expanduser(),
-            Path("~/.config/omarchy/current/theme/alacritty.toml").expanduser(),
-            Path("~/.config/omarchy/current/theme/kitty.conf").expanduser(),
-            Path("~/.config/omarchy/current/theme/foot.ini").expanduser(),
-            HYPR_USER_CONF,
-            (
-                Path(os.getenv("ALACRITTY_CONFIG", "")).expanduser()
-                if os.getenv("ALACRITTY_CONFIG")
-                else None
-            ),
-            Path("~/.config/alacritty").expanduser(),
-            Path("~/.config/alacritty/alacritty.yml").expanduser(),
-            Path("~/.config/alacritty/alacritty.yaml").expanduser(),
-            Path("~/.config/alacritty/alacritty.toml").expanduser(),
-            Path("~/.alacritty.yml").expanduser(),
-            Path("~/.config/gtk-4.0/gtk.css").expanduser(),
-        ]
-        return [p for p in cands if p and Path(p).exists()]
+        cands = _WATCH_CANDIDATES
+        envp = os.getenv("ALACRITTY_CONFIG")
+        if envp:
+            cands = (*cands, Path(envp).expanduser())
+        return [p for p in cands if p.exists()]
 
     def _add_monitor(self, path: Path) -> None:
         try:
@@ -639,27 +876,38 @@ class ThemeWatcher:
                 else f.monitor_file(Gio.FileMonitorFlags.NONE, None)
             mon.connect("changed", self._on_changed)
             self._monitors.append(mon)
-            _dbg(f"Watching {path}")
+            _dbg("Watching %s", path)
         except Exception as e:
-            _dbg(f"Monitor failed for {path}: {e}")
+            _dbg("Monitor failed for %s: %s", path, e)
 
     def _on_style_change(self, *_args) -> None:
         _dbg("Adw color-scheme changed.")
         apply_best_theme()
 
-    def _on_changed(self, *_args) -> None:
-        # debounce rapid bursts and track the timeout id for clean removal
-        def _apply():
-            try:
-                apply_best_theme()
-            except Exception:
-                pass
-            # Remove timeout ID from tracking set before returning
-            self._timeouts.discard(sid)
-            return False  # one-shot timeout
-
-        sid = GLib.timeout_add(150, _apply)
-        self._timeouts.add(sid)
+    def _on_changed(
+        self,
+        _monitor: Gio.FileMonitor,
+        _file: Gio.File,
+        _other_file: Gio.File | None,
+        event_type: Gio.FileMonitorEvent,
+    ) -> None:
+        if event_type not in self._RELEVANT_EVENTS:
+            return
+
+        # collapse a burst into one pending timeout; track its id for clean removal
+        if self._pending_sid is not None:
+            return
+        self._pending_sid = GLib.timeout_add(150, self._fire)
+
+    def _fire(self) -> bool:
+        # clear first so events arriving during apply schedule a fresh timeout
+        self._pending_sid = None
+        # unchanged palettes are short-circuited inside apply_best_theme (_LAST_APPLIED)
+        try:
+            apply_best_theme()
+        except Exception:
+            pass
+        return False  # one-shot timeout
 
 # -------------------- singleton helpers --------------------
 def start_theme_watcher() -> ThemeWatcher:
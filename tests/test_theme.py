@@ -0,0 +1,681 @@
+"""Tests for omnote.theme palette parsing helpers."""
+from __future__ import annotations
+
+import importlib
+import os
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture
+def theme_module(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """Import theme module with gi stubbed and HOME pointing to a temp directory."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+
+    mock_gi = MagicMock()
+    monkeypatch.setitem(sys.modules, "gi", mock_gi)
+    monkeypatch.setitem(sys.modules, "gi.repository", mock_gi.repository)
+
+    # Remove cached theme module so module-level caches and paths start fresh
+    if "omnote.theme" in sys.modules:
+        del sys.modules["omnote.theme"]
+
+    # import_module (not `from omnote import theme`) bypasses the stale package attribute
+    return importlib.import_module("omnote.theme")
+
+
+ALACRITTY_TOML = """\
+[colors.primary]
+background = "#101010"
+foreground = "#efefef"
+[colors.selection]
+background = "#333333"
+text = "#ffffff"
+[colors.bright]
+white = "#fafafa"
+"""
+
+
+# Not valid TOML: structured parse fails, regex fallback applies
+ALACRITTY_RAW = """\
+colors:
+  primary:
+    background: #0a0a0a
+    foreground: 0xfefefe
+  cursor:
+    text: #abcdef
+  selection:
+    foreground: rgb:11/22/33
+"""
+
+
+class TestCachedParse:
+    """Tests for the (parser, path, mtime, size) palette cache."""
+
+    def test_cache_hit_skips_parser(self, theme_module, tmp_path: Path):
+        """A second parse of an unchanged file is served from the cache."""
+        f = tmp_path / "kitty.conf"
+        f.write_text("background #1a1b26\n")
+        calls: list[Path] = []
+
+        def parser(path: Path) -> dict[str, str | None]:
+            calls.append(path)
+            return theme_module._parse_kitty_file(path)
+
+        first = theme_module._cached_parse(f, parser)
+        second = theme_module._cached_parse(f, parser)
+
+        assert first == second
+        assert first["bg"] == "#1a1b26"
+        assert len(calls) == 1
+
+    def test_cached_result_is_a_copy(self, theme_module, tmp_path: Path):
+        """Mutating a returned palette does not corrupt the cache."""
+        f = tmp_path / "kitty.conf"
+        f.write_text("background #1a1b26\n")
+
+        theme_module._cached_parse(f, theme_module._parse_kitty_file)["bg"] = "#000000"
+
+        assert theme_module._cached_parse(f, theme_module._parse_kitty_file)["bg"] == "#1a1b26"
+
+    def test_changed_file_is_reparsed(self, theme_module, tmp_path: Path):
+        """A size/mtime change invalidates the cached entry."""
+        f = tmp_path / "kitty.conf"
+        f.write_text("background #1a1b26\n")
+        theme_module._cached_parse(f, theme_module._parse_kitty_file)
+
+        f.write_text("background #000001\nforeground #ffffff\n")
+
+        pal = theme_module._cached_parse(f, theme_module._parse_kitty_file)
+        assert pal["bg"] == "#000001"
+
+    def test_fifo_eviction(self, theme_module, tmp_path: Path):
+        """The cache is bounded and evicts the oldest entry first."""
+        limit = theme_module._PALETTE_CACHE_MAX
+        files = []
+        for i in range(limit + 1):
+            f = tmp_path / f"kitty{i}.conf"
+            f.write_text(f"background #{i:06x}\n")
+            files.append(f)
+            theme_module._cached_parse(f, theme_module._parse_kitty_file)
+
+        cached_paths = {key[1] for key in theme_module._PALETTE_CACHE}
+        assert len(theme_module._PALETTE_CACHE) == limit
+        assert str(files[0].resolve()) not in cached_paths
+        assert str(files[-1].resolve()) in cached_paths
+
+    def test_missing_file_bypasses_cache(self, theme_module, tmp_path: Path):
+        """A path that cannot be stat'ed is passed straight to the parser."""
+        missing = tmp_path / "nope.toml"
+        assert theme_module._cached_parse(missing, theme_module._parse_alacritty) is None
+        assert theme_module._PALETTE_CACHE == {}
+
+    def test_shared_path_structured_first(self, theme_module, tmp_path: Path):
+        """A cached None from _parse_alacritty does not leak into the regex fallback."""
+        f = tmp_path / "alacritty.toml"
+        f.write_text(ALACRITTY_RAW)
+
+        assert theme_module._cached_parse(f, theme_module._parse_alacritty) is None
+        pal = theme_module._cached_parse(f, theme_module._parse_alacritty_file)
+
+        assert pal["bg"] == "#0a0a0a"
+
+    def test_shared_path_fallback_first(self, theme_module, tmp_path: Path):
+        """A cached regex palette does not leak into _parse_alacritty."""
+        f = tmp_path / "alacritty.toml"
+        f.write_text(ALACRITTY_RAW)
+
+        assert theme_module._cached_parse(f, theme_module._parse_alacritty_file)["bg"] == "#0a0a0a"
+        assert theme_module._cached_parse(f, theme_module._parse_alacritty) is None
+
+    def test_symlink_switch_same_stat(self, theme_module, tmp_path: Path):
+        """Re-pointing the current-theme symlink is seen even if mtime/size match."""
+        themes = tmp_path / "themes"
+        for name, color in (("a", "#111111"), ("b", "#222222")):
+            (themes / name).mkdir(parents=True)
+            f = themes / name / "alacritty.toml"
+            f.write_text(f'[colors.primary]\nbackground = "{color}"\n')
+            os.utime(f, ns=(1_000_000_000, 1_000_000_000))
+        link = theme_module.OMARCHY_CURTHEME
+        link.parent.mkdir(parents=True)
+        link.symlink_to(themes / "a")
+        assert theme_module._from_omarchy_theme()["bg"] == "#111111"
+
+        link.unlink()
+        link.symlink_to(themes / "b")
+
+        assert theme_module._from_omarchy_theme()["bg"] == "#222222"
+
+
+class TestThemeWatcher:
+    """Tests for ThemeWatcher event handling."""
+
+    @pytest.fixture
+    def watcher(self, theme_module, monkeypatch: pytest.MonkeyPatch):
+        """ThemeWatcher whose timeouts are queued and whose apply is counted."""
+        applied: list[int] = []
+        pending: list = []
+        monkeypatch.setattr(theme_module, "apply_best_theme", lambda: applied.append(1))
+        theme_module.GLib.timeout_add = lambda _ms, cb: pending.append(cb) or len(pending)
+        w = theme_module.ThemeWatcher()
+        return w, theme_module.Gio.FileMonitorEvent, applied, pending
+
+    def test_mid_write_events_ignored(self, watcher):
+        """CHANGED / ATTRIBUTE_CHANGED do not schedule a re-apply."""
+        w, ev, _applied, pending = watcher
+        w._on_changed(None, None, None, ev.CHANGED)
+        w._on_changed(None, None, None, ev.ATTRIBUTE_CHANGED)
+        assert pending == []
+
+    def test_burst_collapses_to_one_apply(self, watcher):
+        """Events within one debounce window share a single timeout."""
+        w, ev, applied, pending = watcher
+        w._on_changed(None, None, None, ev.CREATED)
+        w._on_changed(None, None, None, ev.CHANGES_DONE_HINT)
+        assert len(pending) == 1
+        pending.pop()()
+        assert applied == [1]
+
+    def test_repeated_edits_each_reapply(self, watcher):
+        """In-place edits (e.g. an imported colors file) re-apply every time."""
+        w, ev, applied, pending = watcher
+        for _ in range(2):
+            w._on_changed(None, None, None, ev.CHANGES_DONE_HINT)
+            pending.pop()()
+        assert applied == [1, 1]
+
+
+class TestExisting:
+    """Tests for _existing candidate filtering."""
+
+    def test_filters_and_keeps_order(self, theme_module, tmp_path: Path):
+        """Only present paths are returned, in candidate order."""
+        shared = tmp_path / "alacritty"
+        shared.mkdir()
+        (shared / "alacritty.yml").write_text("")
+        (shared / "alacritty.toml").write_text("")
+        lone = tmp_path / ".alacritty.yml"
+        lone.write_text("")
+        cands = [
+            shared / "alacritty.toml",
+            shared / "alacritty.yaml",
+            shared / "alacritty.yml",
+            lone,
+            tmp_path / "missing" / "alacritty.toml",
+        ]
+
+        assert theme_module._existing(cands) == [cands[0], cands[2], lone]
+
+    def test_lone_parent_not_listed(
+        self, theme_module, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Directories holding a single candidate are stat'ed, not scanned."""
+        listed: list[Path] = []
+        real = theme_module._dir_listing
+        monkeypatch.setattr(
+            theme_module, "_dir_listing", lambda p: listed.append(p) or real(p)
+        )
+        shared = tmp_path / "alacritty"
+        cands = [shared / "a.toml", shared / "b.toml", tmp_path / ".alacritty.yml"]
+
+        theme_module._existing(cands)
+
+        assert listed == [shared]
+
+
+class TestKittyFootParsers:
+    """Baseline-equivalent outputs for the kitty / foot line parsers."""
+
+    def test_kitty(self, theme_module):
+        """kitty `key value` lines; comments and prefixed keys ignored."""
+        txt = (
+            "# background #000000\n"
+            "background #1a1b26\n"
+            "foreground   #c0caf5\n"
+            "cursor #c0caf5\n"
+            "selection_background #33467c\n"
+            "selection_foreground none\n"
+            "selection_foreground #c0caf5\n"
+            "backgroundx #000000\n"
+        )
+        assert theme_module._palette_from_kitty_text(txt) == {
+            "bg": "#1a1b26", "fg": "#c0caf5", "caret": "#c0caf5",
+            "sel_bg": "#33467c", "sel_fg": "#c0caf5",
+        }
+
+    def test_foot(self, theme_module):
+        """foot `key=value` lines; bare hex (no #) is not recognised."""
+        txt = (
+            "[colors]\n"
+            "background=1a1b26\n"
+            "foreground = #c0caf5\n"
+            "cursor=#ff00ff #00ff00\n"
+            "selection-background=#33467c\n"
+        )
+        assert theme_module._palette_from_foot_text(txt) == {
+            "bg": None, "fg": "#c0caf5", "caret": "#ff00ff",
+            "sel_bg": "#33467c", "sel_fg": None,
+        }
+
+
+class TestAlacrittyText:
+    """Baseline-equivalent outputs for the Alacritty block/key regex scan."""
+
+    def test_block_keys(self, theme_module):
+        """Unquoted block/key values are picked up by the regex scan."""
+        assert theme_module._palette_from_alacritty_text(ALACRITTY_RAW) == {
+            "bg": "#0a0a0a", "fg": "#fefefe", "caret": "#abcdef",
+            "sel_bg": None, "sel_fg": "#112233",
+        }
+
+    def test_quoted_values_not_matched(self, theme_module):
+        """Quoted TOML values are left to the structured parser."""
+        txt = '[colors.primary]\nbackground = "#101010"\n'
+        assert theme_module._palette_from_alacritty_text(txt)["bg"] is None
+
+    def test_bytes_match_str(self, theme_module):
+        """Bytes input gives the same palette as str input."""
+        assert theme_module._palette_from_alacritty_text(
+            ALACRITTY_RAW.encode()
+        ) == theme_module._palette_from_alacritty_text(ALACRITTY_RAW)
+
+
+class TestAlacrittyStructured:
+    """Tests for the structured TOML/YAML Alacritty parse."""
+
+    def test_alacritty_structured(self, theme_module):
+        """TOML colors are read structurally, with defaults filled in."""
+        assert theme_module._parse_alacritty_text(ALACRITTY_TOML, ".toml") == {
+            "bg": "#101010", "fg": "#efefef", "caret": "#fafafa",
+            "sel_bg": "#333333", "sel_fg": "#ffffff",
+        }
+
+    def test_alacritty_structured_partial(self, theme_module):
+        """Missing selection is mixed from bg/fg; caret falls back to fg."""
+        txt = '[colors.primary]\nbackground = "0x121212"\nforeground = "#abcdefaa"\n'
+        assert theme_module._parse_alacritty_text(txt, ".toml") == {
+            "bg": "#121212", "fg": "#abcdef", "caret": "#abcdef",
+            "sel_bg": "#3b3b3b", "sel_fg": "#abcdef",
+        }
+
+    def test_alacritty_structured_invalid(self, theme_module):
+        """Unparseable TOML yields None."""
+        assert theme_module._parse_alacritty_text(ALACRITTY_RAW, ".toml") is None
+
+    def test_theme_dir_falls_back_to_regex(self, theme_module, tmp_path: Path):
+        """An Omarchy theme with non-TOML alacritty.toml uses the regex scan."""
+        (tmp_path / "alacritty.toml").write_text(ALACRITTY_RAW)
+        assert theme_module._palette_from_theme_dir(tmp_path)["bg"] == "#0a0a0a"
+
+
+class TestNormHex:
+    """Tests for _norm_hex color normalisation."""
+
+    @pytest.mark.parametrize(
+        ("raw", "expected"),
+        [
+            ("#abcdef", "#abcdef"),
+            ("#ABCDEF", "#ABCDEF"),
+            ("#abcdef12", "#abcdef"),
+            ("0xabcdef", "#abcdef"),
+            ("rgb:ab/cd/ef", "#abcdef"),
+            (" #abcdef ", "#abcdef"),
+            ("#abcdef\n", "#abcdef"),
+        ],
+    )
+    def test_valid_forms(self, theme_module, raw: str, expected: str):
+        """Supported hex spellings normalise to #rrggbb."""
+        assert theme_module._norm_hex(raw) == expected
+
+    @pytest.mark.parametrize(
+        "raw",
+        [None, "", "   ", "#abc", "#zzzzzz", "#ab cd", "0xzzzzzz", "0x12345",
+         "rgb:zz/zz/zz", "rgb:abc/d/ef", "red", "abcdef"],
+    )
+    def test_invalid_forms(self, theme_module, raw: str | None):
+        """Malformed or unsupported values are rejected."""
+        assert theme_module._norm_hex(raw) is None
+
+
+# -------------------- CSS --------------------
+def _baseline_css(pal: dict[str, str | None], *, dark: bool) -> str:
+    """Verbatim copy of the pre-template list-join implementation."""
+    bg    = pal.get("bg")     or "#1e1e1e"
+    fg    = pal.get("fg")     or "#e0e0e0"
+    selbg = pal.get("sel_bg") or "alpha(@term_fg,0.15)"
+    selfg = pal.get("sel_fg") or "@term_fg"
+    caret = pal.get("caret")  or "@term_fg"
+
+    entry_mix = 0.06 if dark else 0.12
+
+    css = [
+        "/* generated from palette */",
+        f"@define-color term_bg {bg};",
+        f"@define-color term_fg {fg};",
+        f"@define-color term_sel_bg {selbg};",
+        f"@define-color term_sel_fg {selfg};",
+        f"@define-color term_caret {caret};",
+        "",
+        "window, .background {",
+        "  background-color: @term_bg;",
+        "  color: @term_fg;",
+        "}",
+        "textview, textview.view {",
+        "  background-color: @term_bg;",
+        "  color: @term_fg;",
+        "}",
+        "textview > text, textview.view > text {",
+        "  background-color: @term_bg;",
+        "  background-image: none;",
+        "  color: @term_fg;",
+        "  caret-color: @term_caret;",
+        "}",
+        "textview text selection {",
+        "  background-color: @term_sel_bg;",
+        "  color: @term_sel_fg;",
+        "}",
+        "/* GtkSourceView line numbers gutter */",
+        "textview border, textview.view border {",
+        "  background-color: @term_bg;",
+        "  color: alpha(@term_fg, 0.5);",
+        "}",
+        "textview.view gutter, textview gutter {",
+        "  background-color: @term_bg;",
+        "}",
+        "textview.view gutter.left, textview.view gutter.right {",
+        "  background-color: @term_bg;",
+        "}",
+        "headerbar, .titlebar {",
+        "  background-color: @term_bg;",
+        "  color: @term_fg;",
+        "  border-bottom: 1px solid alpha(@term_fg, 0.08);",
+        "}",
+        "entry, searchentry {",
+        f"  background-color: mix(@term_bg, @term_fg, {entry_mix});",
+        "  color: @term_fg;",
+        "  border: 1px solid alpha(@term_fg, 0.15);",
+        "}",
+        "entry:focus, searchentry:focus {",
+        "  border-color: alpha(@term_fg, 0.28);",
+        "}",
+        "entry selection, searchentry selection {",
+        "  background-color: @term_sel_bg;",
+        "  color: @term_sel_fg;",
+        "}",
+        "/* Floating find/replace bar styling */",
+        "stack {",
+        "  background-color: @term_bg;",
+        "  border: 1px solid alpha(@term_fg, 0.2);",
+        "  border-radius: 8px;",
+        "  box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);",
+        "}",
+        "/* Tab bar theming */",
+        "tabbar, tabbar > scrolledwindow, tabbar > revealer > box {",
+        "  background-color: @term_bg;",
+        "}",
+        "tabbar separator {",
+        "  background: transparent;",
+        "  min-width: 0;",
+        "  min-height: 0;",
+        "}",
+        "tabbar tab, .tab {",
+        "  background-color: alpha(@term_fg, 0.02);",
+        "  color: alpha(@term_fg, 0.5);",
+        "  border: none;",
+        "  border-bottom: 2px solid transparent;",
+        "  min-height: 28px;",
+        "  min-width: 160px;",
+        "  padding: 4px 14px;",
+        "}",
+        "tabbar tab > box, .tab > box {",
+        "  min-width: 0;",
+        "}",
+        "tabbar tab:hover, .tab:hover {",
+        "  background-color: alpha(@term_fg, 0.05);",
+        "  color: alpha(@term_fg, 0.8);",
+        "}",
+        (
+            "tabbar tab:selected, tabbar tab:checked, tabbar tab:active, "
+            ".tab:selected, .tab:checked, .tab:active {"
+        ),
+        "  background-color: alpha(@term_fg, 0.12);",
+        "  color: @term_fg;",
+        "  border-bottom: 2px solid alpha(@term_fg, 0.5);",
+        "  font-weight: 500;",
+        "}",
+        "tabbar .start-action, tabbar .end-action {",
+        "  background-color: @term_bg;",
+        "}",
+        "tabbar button {",
+        "  background: transparent;",
+        "  border: none;",
+        "  color: alpha(@term_fg, 0.5);",
+        "  min-height: 24px;",
+        "  min-width: 24px;",
+        "}",
+        "tabbar button:hover {",
+        "  color: @term_fg;",
+        "  background-color: alpha(@term_fg, 0.15);",
+        "}",
+    ]
+    return "\n".join(css)
+
+
+class TestCssFromPalette:
+    """Tests for the template-based _css_from_palette."""
+
+    # the template splits this one selector over two lines to respect the line limit
+    SPLIT_SELECTOR = ("tabbar tab:active,\n.tab:selected", "tabbar tab:active, .tab:selected")
+
+    @pytest.mark.parametrize("dark", [True, False])
+    @pytest.mark.parametrize(
+        "pal",
+        [
+            {"bg": "#1a1b26", "fg": "#c0caf5", "sel_bg": "#33467c",
+             "sel_fg": "#c0caf5", "caret": "#c0caf5"},
+            {"bg": None, "fg": None, "sel_bg": None, "sel_fg": None, "caret": None},
+        ],
+    )
+    def test_matches_baseline(self, theme_module, pal: dict[str, str | None], dark: bool):
+        """Generated CSS equals the old list-join output."""
+        css = theme_module._css_from_palette(pal, dark=dark).decode("utf-8")
+        assert css.replace(*self.SPLIT_SELECTOR) == _baseline_css(pal, dark=dark)
+
+    def test_memoized_bytes(self, theme_module):
+        """Identical palettes reuse the cached bytes; a change rebuilds them."""
+        pal = {"bg": "#101010", "fg": "#efefef"}
+        first = theme_module._css_from_palette(pal, dark=True)
+
+        assert isinstance(first, bytes)
+        assert theme_module._css_from_palette(dict(pal), dark=True) is first
+        assert theme_module._css_from_palette(pal, dark=False) is not first
+
+
+class TestApplyBestTheme:
+    """Tests for the _LAST_APPLIED no-op guard in apply_best_theme."""
+
+    @pytest.fixture
+    def applied(self, theme_module, monkeypatch: pytest.MonkeyPatch):
+        """Record _apply_css calls; install a fake provider like the real one."""
+        calls: list[object] = []
+
+        def fake_apply_css(css=None, path=None) -> None:
+            calls.append(css if css is not None else path)
+            theme_module._CURRENT_PROVIDER = object() if (css or path) else None
+
+        monkeypatch.setattr(theme_module, "_apply_css", fake_apply_css)
+        monkeypatch.delenv("OMNOTE_THEME_MODE", raising=False)
+        monkeypatch.delenv("MICROPAD_THEME_MODE", raising=False)
+        self._set_dark(theme_module, False)
+        theme_module._getenv.cache_clear()
+        return calls
+
+    @staticmethod
+    def _set_dark(theme_module, dark: bool) -> None:
+        theme_module.Adw.StyleManager.get_default.return_value.get_dark.return_value = dark
+
+    def test_repeated_apply_is_noop(self, theme_module, applied):
+        """An identical second apply leaves the provider alone."""
+        theme_module.apply_best_theme()
+        theme_module.apply_best_theme()
+        assert len(applied) == 1
+
+    def test_dark_flip_reapplies(self, theme_module, applied):
+        """Switching dark/light changes the key and re-applies."""
+        theme_module.apply_best_theme()
+        self._set_dark(theme_module, True)
+        theme_module.apply_best_theme()
+
+        assert len(applied) == 2
+        assert applied[0] != applied[1]
+
+    def test_system_mode_clears_key(
+        self, theme_module, applied, monkeypatch: pytest.MonkeyPatch
+    ):
+        """System mode clears the provider and the key, so leaving it re-applies."""
+        theme_module.apply_best_theme()
+
+        monkeypatch.setenv("OMNOTE_THEME_MODE", "system")
+        theme_module._getenv.cache_clear()
+        theme_module.apply_best_theme()
+        assert theme_module._LAST_APPLIED is None
+        assert applied[-1] is None
+
+        monkeypatch.delenv("OMNOTE_THEME_MODE")
+        theme_module._getenv.cache_clear()
+        theme_module.apply_best_theme()
+        assert len(applied) == 3
+        assert applied[-1] == applied[0]
+
+
+class TestImports:
+    """Tests for Alacritty import-chain collection."""
+
+    def _collect(self, theme_module, path: Path) -> dict[str, str | None]:
+        agg = theme_module._collect_imports_text(path, visited=set())
+        assert isinstance(agg, bytes)
+        return theme_module._palette_from_alacritty_text(agg)
+
+    def test_relative_and_glob(self, theme_module, tmp_path: Path):
+        """Relative and glob imports resolve next to the importing file."""
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "x1.yml").write_text("primary:\n  background: #777777\n")
+        (tmp_path / "y.yml").write_text("cursor:\n  cursor: #888888\n")
+        main = tmp_path / "main.yml"
+        main.write_text('import: ["sub/x*.yml", "y.yml", "missing.yml"]\n')
+
+        pal = self._collect(theme_module, main)
+
+        assert pal["bg"] == "#777777"
+        assert pal["caret"] == "#888888"
+
+    def test_home_import(self, theme_module, tmp_path: Path):
+        """`~` in import paths expands to $HOME."""
+        (tmp_path / "home" / "colors.yml").write_text("primary:\n  foreground: #555555\n")
+        main = tmp_path / "main.yml"
+        main.write_text('import:\n  - "~/colors.yml"\n')
+
+        assert self._collect(theme_module, main)["fg"] == "#555555"
+
+    def test_absolute_glob_and_nested(self, theme_module, tmp_path: Path):
+        """Absolute globs expand and nested imports are followed."""
+        (tmp_path / "a.yml").write_text("primary:\n  background: #444444\n")
+        (tmp_path / "b.yml").write_text(f'import:\n  - "{tmp_path}/a.yml"\n')
+        (tmp_path / "c1.yml").write_text("selection:\n  background: #666666\n")
+        main = tmp_path / "main.conf"
+        main.write_text(
+            f'import: ["{tmp_path}/b.yml", "{tmp_path}/c*.yml"]\n'
+            "primary:\n  foreground: #555555\n"
+        )
+
+        pal = self._collect(theme_module, main)
+
+        assert (pal["bg"], pal["fg"], pal["sel_bg"]) == ("#444444", "#555555", "#666666")
+
+    def test_invalid_glob_is_ignored(self, theme_module, tmp_path: Path):
+        """A pattern Path.glob rejects is skipped instead of raising."""
+        (tmp_path / "themes").mkdir()
+        main = tmp_path / "main.yml"
+        main.write_text('import: ["themes/**x.yml"]\nprimary:\n  background: #123456\n')
+
+        assert theme_module._expand_import("themes/**x.yml", tmp_path) == []
+        assert self._collect(theme_module, main)["bg"] == "#123456"
+
+    def test_cycle_terminates(self, theme_module, tmp_path: Path):
+        """Mutual imports are visited once each."""
+        (tmp_path / "a.yml").write_text('import: ["b.yml"]\nprimary:\n  background: #010101\n')
+        (tmp_path / "b.yml").write_text('import: ["a.yml"]\n')
+
+        agg = theme_module._collect_imports_text(tmp_path / "a.yml", visited=set())
+
+        assert agg.count(b"background") == 1
+
+    def test_symlinked_import_visited_once(self, theme_module, tmp_path: Path):
+        """A file reached through a symlink and directly is read once."""
+        (tmp_path / "real.yml").write_text("primary:\n  background: #020202\n")
+        (tmp_path / "link.yml").symlink_to(tmp_path / "real.yml")
+        main = tmp_path / "main.yml"
+        main.write_text('import: ["link.yml", "./real.yml"]\n')
+
+        visited: set[str] = set()
+        agg = theme_module._collect_imports_text(main, visited=visited)
+
+        assert agg.count(b"background") == 1
+        assert os.path.realpath(tmp_path / "real.yml") in visited
+
+
+class TestMixColor:
+    """Tests for _mix_color."""
+
+    @pytest.mark.parametrize(
+        ("a", "b", "t", "expected"),
+        [
+            ("#000000", "#ffffff", 0.15, "#262626"),
+            ("#1e1e1e", "#e0e0e0", 0.5, "#7f7f7f"),
+            ("#123456", "#abcdef", 0.0, "#123456"),
+            ("#123456", "#abcdef", 1.0, "#abcdef"),
+            ("123456", "abcdef", 0.0, "#123456"),
+        ],
+    )
+    def test_mix(self, theme_module, a: str, b: str, t: float, expected: str):
+        """Channels are interpolated linearly."""
+        assert theme_module._mix_color(a, b, t) == expected
+
+    @pytest.mark.parametrize(
+        ("a", "b"), [("0x121212", "#abcdef"), ("#abc", "#fff"), ("", "#ffffff")]
+    )
+    def test_unparseable_falls_back(self, theme_module, a: str, b: str):
+        """Unparseable input mixes the default bg/fg pair instead."""
+        assert theme_module._mix_color(a, b, 0.15) == "#3b3b3b"
+
+
+class TestFromAlacrittyConfig:
+    """Tests for _from_alacritty_config source selection."""
+
+    def test_structured_parse_skips_import_walk(
+        self, theme_module, monkeypatch: pytest.MonkeyPatch
+    ):
+        """A parsed TOML palette is returned without collecting imports."""
+        conf = Path("~/.config/alacritty/alacritty.toml").expanduser()
+        conf.parent.mkdir(parents=True)
+        conf.write_text('[colors.primary]\nbackground = "#101010"\n')
+
+        def fail(*_args, **_kwargs):
+            raise AssertionError("import chain walked")
+
+        monkeypatch.setattr(theme_module, "_collect_imports_text", fail)
+
+        assert theme_module._from_alacritty_config()["bg"] == "#101010"
+
+    def test_unparseable_falls_back_to_imports(self, theme_module):
+        """Non-TOML content is scanned via the import collector."""
+        conf = Path("~/.config/alacritty/alacritty.toml").expanduser()
+        conf.parent.mkdir(parents=True)
+        conf.write_text(ALACRITTY_RAW)
+
+        assert theme_module._from_alacritty_config()["bg"] == "#0a0a0a"